@@ -0,0 +1,269 @@
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+# --- Response cache for runner.run_debug ---
+# The scripts send the same fixed prompts on every run, so during development
+# each re-run pays for an identical LLM round-trip. Responses are keyed on the
+# agent tree (model, instructions, config, callbacks, tools including agents
+# wrapped by AgentTool), the runner's app config and the prompt, and stored
+# both in memory and as JSON under ~/.adk_cache/.
+#
+# run_debug keeps one debug session per runner, so later prompts see earlier
+# turns. The key therefore also covers that session's prior events, and a hit
+# replays the cached turn into the session so the next prompt sees the same
+# history it would have seen on a live run.
+#
+# Entries expire after ADK_CACHE_TTL seconds (default 3600), because agents
+# using google_search answer questions like "today's weather" that go stale.
+# Set ADK_CACHE=0 to bypass the cache entirely.
+
+CACHE_DIR = Path.home() / ".adk_cache"
+
+# The ids runner.run_debug uses when none are passed.
+DEBUG_USER_ID = "debug_user_id"
+DEBUG_SESSION_ID = "debug_session_id"
+
+DEFAULT_TTL_SECONDS = 3600
+
+_memory_cache = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+_CALLBACK_FIELDS = (
+    "before_agent_callback",
+    "after_agent_callback",
+    "before_model_callback",
+    "after_model_callback",
+    "before_tool_callback",
+    "after_tool_callback",
+)
+
+
+def _describe_callable(func):
+    """Identifies a function by name and by its code, so edits change the key."""
+    if isinstance(func, (list, tuple)):
+        return [_describe_callable(f) for f in func]
+    qualname = getattr(func, "__qualname__", repr(func))
+    name = f"{getattr(func, '__module__', '')}.{qualname}"
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return name
+    digest = hashlib.sha256()
+    _hash_code(code, digest)
+    return f"{name}:{digest.hexdigest()[:16]}"
+
+
+def _hash_code(code, digest):
+    """Feeds a code object's bytecode and constants into `digest`.
+
+    Nested code objects (genexprs, lambdas, inner functions) are hashed
+    recursively rather than via repr(), which embeds their memory address and
+    would change the key on every interpreter start.
+    """
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _hash_code(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+def _describe_tool(tool):
+    # AgentTool wraps a whole agent; its name alone would hide edits to it.
+    if getattr(tool, "agent", None) is not None:
+        return {"agent_tool": _describe_agent(tool.agent)}
+    func = getattr(tool, "func", tool)
+    if callable(func) and hasattr(func, "__code__"):
+        return {"function": _describe_callable(func)}
+    return {"tool": getattr(tool, "name", None) or type(tool).__name__}
+
+
+def _describe_agent(agent):
+    """Returns a JSON-friendly description of everything that shapes a response."""
+    model = getattr(agent, "model", "")
+    instruction = getattr(agent, "instruction", "")
+    static_instruction = getattr(agent, "static_instruction", None)
+    config = getattr(agent, "generate_content_config", None)
+    return {
+        "name": agent.name,
+        "model": model if isinstance(model, str) else getattr(model, "model", ""),
+        "instr": instruction if isinstance(instruction, str) else repr(instruction),
+        "static_instr": str(static_instruction) if static_instruction else "",
+        "output_key": getattr(agent, "output_key", None),
+        "config": config.model_dump(mode="json", exclude_none=True) if config else None,
+        "callbacks": {
+            field: _describe_callable(getattr(agent, field))
+            for field in _CALLBACK_FIELDS
+            if getattr(agent, field, None)
+        },
+        "tools": sorted(
+            (_describe_tool(t) for t in getattr(agent, "tools", [])),
+            key=lambda d: json.dumps(d, sort_keys=True),
+        ),
+        "sub_agents": [_describe_agent(a) for a in agent.sub_agents],
+    }
+
+
+def _describe_runner(runner):
+    """Describes the agent tree plus the app-level config the runner applies."""
+    app_config = {}
+    for field in ("context_cache_config", "resumability_config"):
+        value = getattr(runner, field, None)
+        if value is not None:
+            app_config[field] = value.model_dump(mode="json")
+    return {
+        "app": getattr(runner, "app_name", ""),
+        "app_config": app_config,
+        "agent": _describe_agent(runner.agent),
+    }
+
+
+def _child_agents(agent):
+    tools = getattr(agent, "tools", [])
+    tool_agents = [t.agent for t in tools if getattr(t, "agent", None)]
+    return list(agent.sub_agents) + tool_agents
+
+
+def _is_cacheable(agent):
+    """Sampling with temperature > 0 is not deterministic, so never cache it."""
+    config = getattr(agent, "generate_content_config", None)
+    if config is not None and config.temperature and config.temperature > 0:
+        return False
+    return all(_is_cacheable(a) for a in _child_agents(agent))
+
+
+def _describe_history(session):
+    if session is None:
+        return []
+    return [
+        {
+            "author": event.author,
+            "content": (
+                event.content.model_dump(mode="json", exclude_none=True)
+                if event.content
+                else None
+            ),
+        }
+        for event in session.events
+    ]
+
+
+def _cache_key(runner, session, prompt):
+    payload = {
+        "runner": _describe_runner(runner),
+        "history": _describe_history(session),
+        "prompt": prompt,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+async def _replay_into_session(runner, session, prompt, events):
+    """Appends the cached turn to the debug session, as a live run would."""
+    from google.adk.events import Event
+    from google.genai import types
+
+    if session is None:
+        session = await runner.session_service.create_session(
+            app_name=runner.app_name,
+            user_id=DEBUG_USER_ID,
+            session_id=DEBUG_SESSION_ID,
+        )
+    user_event = Event(
+        invocation_id=events[0].invocation_id if events else "",
+        author="user",
+        content=types.Content(role="user", parts=[types.Part(text=prompt)]),
+    )
+    for event in [user_event, *events]:
+        await runner.session_service.append_event(
+            session, event.model_copy(update={"timestamp": time.time()})
+        )
+
+
+def _cache_enabled():
+    return os.getenv("ADK_CACHE", "1") != "0"
+
+
+def _ttl_seconds():
+    try:
+        return float(os.getenv("ADK_CACHE_TTL", DEFAULT_TTL_SECONDS))
+    except ValueError:
+        return DEFAULT_TTL_SECONDS
+
+
+def _is_fresh(entry):
+    return time.time() - entry["created"] < _ttl_seconds()
+
+
+def _is_valid_entry(entry):
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get("created"), (int, float))
+        and isinstance(entry.get("events"), list)
+    )
+
+
+def _read_entry(path):
+    """Returns the stored entry, or None if it is missing or unreadable."""
+    try:
+        entry = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return entry if _is_valid_entry(entry) else None
+
+
+def _write_entry(path, entry):
+    # Write then rename, so an interrupted run never leaves a truncated entry.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+async def cached_run_debug(runner, prompt):
+    """Drop-in replacement for `await runner.run_debug(prompt)` with caching."""
+    from google.adk.events import Event
+
+    if not _cache_enabled() or not _is_cacheable(runner.agent):
+        return await runner.run_debug(prompt)
+
+    session = await runner.session_service.get_session(
+        app_name=runner.app_name, user_id=DEBUG_USER_ID, session_id=DEBUG_SESSION_ID
+    )
+    key = _cache_key(runner, session, prompt)
+    path = CACHE_DIR / f"{key}.json"
+
+    entry = _memory_cache.get(key)
+    if entry is None:
+        entry = await asyncio.to_thread(_read_entry, path)
+    events = None
+    if entry is not None and _is_fresh(entry):
+        try:
+            events = [Event.model_validate_json(e) for e in entry["events"]]
+        except ValueError:
+            events = None  # Stored with an incompatible Event schema; refetch.
+    if events is not None:
+        _stats["hits"] += 1
+        _memory_cache[key] = entry
+        await _replay_into_session(runner, session, prompt, events)
+        return events
+
+    _stats["misses"] += 1
+    response = await runner.run_debug(prompt)
+    entry = {
+        "created": time.time(),
+        "events": [event.model_dump_json(exclude_none=True) for event in response],
+    }
+    _memory_cache[key] = entry
+    await asyncio.to_thread(_write_entry, path, entry)
+    return response
+
+
+@atexit.register
+def _print_stats():
+    if _stats["hits"] or _stats["misses"]:
+        print(f"LLM cache: {_stats['hits']} hits, {_stats['misses']} misses")
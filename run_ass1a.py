@@ -8,6 +8,8 @@ from google.adk.runners import InMemoryRunner
 from google.adk.tools import google_search
 from google.genai import types
 
+from llm_cache import cached_run_debug
+
 async def main():
     """
     Main async function to run our agent
@@ -41,16 +43,18 @@ async def main():
     print("Starting agent run...")
 
     # first question
-    response = await runner.run_debug(
-        "What is Agent Development Kit from Google? What languages is the SDK available in?"
+    response = await cached_run_debug(
+        runner,
+        "What is Agent Development Kit from Google? What languages is the SDK available in?",
     )
     print("Response to first question:")
     print(response)
 
     # second question
     print("\nAsking second question... ")
-    response_weather = await runner.run_debug(
-        "What is the weather in New York City today?"
+    response_weather = await cached_run_debug(
+        runner,
+        "What is the weather in New York City today?",
     )
     print("Response to second question:")
     print(response_weather)
@@ -1,44 +1,69 @@
 import argparse
 import asyncio
+import functools
 import os
+import re
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from google.adk.agents import Agent, LoopAgent, ParallelAgent, SequentialAgent
-from google.adk.models.google_llm import Gemini
-from google.adk.runners import InMemoryRunner
-from google.adk.tools import AgentTool, FunctionTool, google_search
-from google.genai import types
 
-# --- Global congig ---
-RETRY_CONFIG = types.HttpRetryOptions(
-    attempts=5, exp_base=7, initial_delay=1, http_status_codes=[429, 500, 503, 504]
-)
+from llm_cache import cached_run_debug
+
+# google.adk is imported inside the functions that use it, so `--help` and
+# argument errors return without loading the SDK.
+if TYPE_CHECKING:
+    from google.adk.tools.tool_context import ToolContext
 
-MODEL = Gemini(model="gemini-2.5-flash-lite", retry_options=RETRY_CONFIG)
+
+# --- Global congig ---
+@functools.lru_cache(maxsize=1)
+def get_model():
+    """Returns the Gemini model shared by every agent in every section.
+
+    Gemini creates its genai Client once (a cached property) and runners never
+    create their own, so sharing this instance keeps one HTTP connection pool.
+    """
+    from google.adk.models.google_llm import Gemini
+    from google.genai import types
+
+    retry_config = types.HttpRetryOptions(
+        attempts=5, exp_base=7, initial_delay=1, http_status_codes=[429, 500, 503, 504]
+    )
+    return Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config)
 
 
 # --- SECTION 2: LLM based Coordinator ("Manager") ---
 async def run_section2_coordinator():
+    from google.adk.agents import Agent
+    from google.adk.runners import InMemoryRunner
+    from google.adk.tools import AgentTool, google_search
+
     print("--- Running Section 2: LLM-based Coordinator ---")
 
     research_agent = Agent(
         name="ResearchAgent",
-        model=MODEL,
+        model=get_model(),
         instruction="""You are a specialized research agent. Your only job is to use the google_search tool to find 2-3 pieces of relevant information on the given topic and present the findings with citations.""",
         tools=[google_search],
         output_key="research_findings",
     )
 
+    # Agents that consume upstream output keep their rules in `static_instruction`
+    # (sent as the system instruction, a stable prefix Gemini can cache) and put
+    # the `{state}` placeholders in `instruction`, which ADK then sends as user
+    # content after that prefix. The later sections follow the same split.
     summarizer_agent = Agent(
         name="SummarizerAgent",
-        model=MODEL,
-        instruction="""Read the provided research findings: {research_findings}. Create a concise summary as a bulleted list with 3-5 key points.""",
+        model=get_model(),
+        static_instruction="""Read the provided research findings. Create a concise summary as a bulleted list with 3-5 key points.""",
+        instruction="""Research findings:
+        {research_findings}""",
         output_key="final_summary",
     )
 
     root_agent = Agent(
         name="ResearchCoordinator",
-        model=MODEL,
+        model=get_model(),
         instruction="""You are a research coordinator. Your goal is to answer the user's query by orchestrating a workflow.
         1. First, you MUST call the `ResearchAgent` tool to find relevant information on the topic provided by the user.
         2. Next, after receiving the research findings, you MUST call the `SummarizerAgent` tool to create a concise summary.
@@ -47,8 +72,9 @@ async def run_section2_coordinator():
     )
 
     runner = InMemoryRunner(agent=root_agent)
-    response = await runner.run_debug(
-        "What are the latest advancements in quantum computing and what do they mean for AI?"
+    response = await cached_run_debug(
+        runner,
+        "What are the latest advancements in quantum computing and what do they mean for AI?",
     )
     print("--- Final Response (Section 2) ---")
     print(response)
@@ -56,26 +82,33 @@ async def run_section2_coordinator():
 
 # --- SECTION 3: Sequential workflow ("Assembly Line") ---
 async def run_section3_sequential():
+    from google.adk.agents import Agent, SequentialAgent
+    from google.adk.runners import InMemoryRunner
+
     print("--- Running Section 3: Sequential Workflow ---")
 
     outline_agent = Agent(
         name="OutlineAgent",
-        model=MODEL,
+        model=get_model(),
         instruction="""Create a blog outline for the given topic with: 1. A catchy headline 2. An introduction hook 3. 3-5 main sections with 2-3 bullet points for each 4. A concluding thought""",
         output_key="blog_outline",
     )
 
     writer_agent = Agent(
         name="WriterAgent",
-        model=MODEL,
-        instruction="""Following this outline strictly: {blog_outline}. Write a brief, 200 to 300-word blog post with an engaging and informative tone.""",
+        model=get_model(),
+        static_instruction="""Following the provided outline strictly, write a brief, 200 to 300-word blog post with an engaging and informative tone.""",
+        instruction="""Outline:
+        {blog_outline}""",
         output_key="blog_draft",
     )
 
     editor_agent = Agent(
         name="EditorAgent",
-        model=MODEL,
-        instruction="""Edit this draft: {blog_draft}. Your task is to polish the text by fixing any grammatical errors, improving the flow and sentence structure, and enhancing overall clarity.""",
+        model=get_model(),
+        static_instruction="""Edit the provided draft. Your task is to polish the text by fixing any grammatical errors, improving the flow and sentence structure, and enhancing overall clarity.""",
+        instruction="""Draft:
+        {blog_draft}""",
         output_key="final_blog",
     )
 
@@ -85,113 +118,157 @@ async def run_section3_sequential():
     )
 
     runner = InMemoryRunner(agent=root_agent)
-    response = await runner.run_debug(
-        "Write a blog post about the benefits of multi-agent systems for software developers"
+    response = await cached_run_debug(
+        runner,
+        "Write a blog post about the benefits of multi-agent systems for software developers",
     )
     print("--- Final Response (Section 3) ---")
     print(response)
 
 
-# --- SECTION 4: Parallel workflow ("Research team") ---
-async def run_section4_parallel():
-    print("--- Running Section 4: Parallel Workflow ---")
+# --- SECTION 4: Batched research ("Research team") ---
+# Keyed by heading prefix, so "Technology" and "Financial" headings match too.
+RESEARCH_SECTIONS = {
+    "TECH": "tech_research",
+    "HEALTH": "health_research",
+    "FINANC": "finance_research",
+}
 
-    tech_researcher = Agent(
-        name="TechResearcher",
-        model=MODEL,
-        instruction="""Research the latest AI/ML trends. Include 3 key developments, the main companies involved, and the potential impact. Keep the report very concise (100 words).""",
-        tools=[google_search],
-        output_key="tech_research",
-    )
+# Matches "### TECH", "## Technology Trends", "## Health Breakthroughs",
+# "**FINANCE:** ..." and similar; the section body starts after the heading.
+RESEARCH_HEADING = re.compile(
+    r"^[ \t]*(?:#+[ \t]*\**|\*\*)[ \t]*(TECH|HEALTH|FINANC)\w*[^\n:*]*[:*]*",
+    re.M | re.I,
+)
 
-    health_researcher = Agent(
-        name="HealthResearcher",
-        model=MODEL,
-        instruction="""Research recent medical breakthroughs. Include 3 significant advances, their practical applications, and estimated timelines. Keep the report concise (100 words).""",
-        tools=[google_search],
-        output_key="health_research",
-    )
 
-    finance_researcher = Agent(
-        name="FinanceResearcher",
-        model=MODEL,
-        instruction="""Research current fintech trends. Include 3 key trends, their market implications, and the future outlook. Keep the report concise (100 words).""",
+def save_research_sections(callback_context, llm_response):
+    """Splits the TOPIC sections of the briefing into their own state keys.
+
+    Every key is first set to the full reply, so a section the model did not
+    label still gives the aggregator something to read.
+    """
+    if not (llm_response.content and llm_response.content.parts):
+        return None
+    text = "".join(part.text or "" for part in llm_response.content.parts).strip()
+    if not text:
+        return None
+    for key in RESEARCH_SECTIONS.values():
+        callback_context.state[key] = text
+    headings = list(RESEARCH_HEADING.finditer(text))
+    for heading, next_heading in zip(headings, headings[1:] + [None]):
+        end = next_heading.start() if next_heading else len(text)
+        body = text[heading.end() : end].strip()
+        if body:
+            callback_context.state[RESEARCH_SECTIONS[heading.group(1).upper()]] = body
+    return None
+
+
+async def run_section4_batched():
+    from google.adk.agents import Agent, SequentialAgent
+    from google.adk.runners import InMemoryRunner
+    from google.adk.tools import google_search
+
+    print("--- Running Section 4: Batched Research ---")
+
+    # The three research topics are independent, so one researcher covers them
+    # in a single call (one prefill, one search session) and the callback fans
+    # the labeled sections back out into the keys the aggregator reads.
+    multi_researcher = Agent(
+        name="MultiResearcher",
+        model=get_model(),
+        instruction="""Research the following three topics and write one report per topic:
+        - TECH: Research the latest AI/ML trends. Include 3 key developments, the main companies involved, and the potential impact. Keep the report very concise (100 words).
+        - HEALTH: Research recent medical breakthroughs. Include 3 significant advances, their practical applications, and estimated timelines. Keep the report concise (100 words).
+        - FINANCE: Research current fintech trends. Include 3 key trends, their market implications, and the future outlook. Keep the report concise (100 words).
+        Output exactly three sections, each starting on its own line with its heading, in this format:
+        ### TECH
+        ...
+        ### HEALTH
+        ...
+        ### FINANCE
+        ...""",
         tools=[google_search],
-        output_key="finance_research",
+        after_model_callback=save_research_sections,
     )
 
     aggregator_agent = Agent(
         name="AggregatorAgent",
-        model=MODEL,
-        instruction="""Combine these three research findings into a single executive summary:
-        **Technology Trends:** {tech_research}
-        **Health Breakthroughs:** {health_research}
-        **Finance Innovations:** {finance_research}
+        model=get_model(),
+        static_instruction="""Combine the three provided research findings into a single executive summary.
         Your summary should highlight common themes, surprising connections, and the most important key takeaways from all three reports. The final summary should be around 200 words.""",
+        instruction="""**Technology Trends:** {tech_research?}
+        **Health Breakthroughs:** {health_research?}
+        **Finance Innovations:** {finance_research?}""",
         output_key="executive_summary",
     )
 
-    parallel_research_team = ParallelAgent(
-        name="ParallelResearchTeam",
-        sub_agents=[tech_researcher, health_researcher, finance_researcher],
-    )
-
     root_agent = SequentialAgent(
         name="ResearchSystem",
-        sub_agents=[parallel_research_team, aggregator_agent],
+        sub_agents=[multi_researcher, aggregator_agent],
     )
 
     runner = InMemoryRunner(agent=root_agent)
-    response = await runner.run_debug(
-        "Run the daily executive briefing on Tech, Health, and Finance"
+    response = await cached_run_debug(
+        runner,
+        "Run the daily executive briefing on Tech, Health, and Finance",
     )
     print("--- Final Response (Section 4) ---")
     print(response)
 
 
 # --- SECTION 5: Loop Workflow ("Quality control") ---
-def exit_loop():
-    """Call this function ONLY when the critique is 'APPROVED', indicating the story is finished and no more changes are needed."""
+STORY_PATTERN = re.compile(r"<story>(.*?)</story>", re.DOTALL)
+
+
+def exit_loop(tool_context: "ToolContext"):
+    """Call this function ONLY when the story is well-written and complete, indicating the story is finished and no more changes are needed."""
+    # LoopAgent only stops early when a sub-agent escalates.
+    tool_context.actions.escalate = True
     return {"status": "approved", "message": "Story approved. Exiting refinement loop."}
 
 
+def save_revised_story(callback_context, llm_response):
+    """Stores the story between <story> tags as the new `current_story`."""
+    if not (llm_response.content and llm_response.content.parts):
+        return None
+    text = "".join(part.text or "" for part in llm_response.content.parts)
+    match = STORY_PATTERN.search(text)
+    if match:
+        callback_context.state["current_story"] = match.group(1).strip()
+    return None
+
+
 async def run_section5_loop():
+    from google.adk.agents import Agent, LoopAgent, SequentialAgent
+    from google.adk.runners import InMemoryRunner
+    from google.adk.tools import FunctionTool
+
     print("--- Running Section 5: Loop Workflow ---")
 
     initial_writer_agent = Agent(
         name="InitialWriterAgent",
-        model=MODEL,
+        model=get_model(),
         instruction="""Based on the user's prompt, write the first draft of a short story (around 100-150 words). Output only the story text, with no introduction or explanation.""",
         output_key="current_story",
     )
 
-    critic_agent = Agent(
-        name="CriticAgent",
-        model=MODEL,
-        instruction="""You are a constructive story critic. Review the story provided below.
-        Story: {current_story}
-        Evaluate the story's plot, characters, and pacing.
-        - If the story is well-written and complete, you MUST respond with the exact phrase: "APPROVED"
-        - Otherwise, provide 2-3 specific, actionable suggestions for improvement.""",
-        output_key="critique",
-    )
-
-    refiner_agent = Agent(
-        name="RefinerAgent",
-        model=MODEL,
-        instruction="""You are a story refiner. You have a story draft and critique.
-        Story Draft: {current_story}
-        Critique: {critique}
-        Your task is to analyze the critique.
-        - IF the critique is EXACTLY "APPROVED", you MUST call the `exit_loop` function and nothing else.
-        - OTHERWISE, rewrite the story draft to fully incorporate the feedback from the critique.""",
-        output_key="current_story",  # It overwrites the story with the new version
+    # Critique and rewrite happen in one model call per iteration, so the story
+    # is sent once instead of once to a critic and again to a refiner.
+    critic_refiner_agent = Agent(
+        name="CriticRefinerAgent",
+        model=get_model(),
+        static_instruction="""You are a constructive story critic and refiner. Evaluate the provided story's plot, characters, and pacing.
+        - If the story is well-written and complete, you MUST call the `exit_loop` function and nothing else.
+        - OTHERWISE, rewrite the story to address your 2-3 most important improvements, and output the revised story between <story> and </story> tags.""",
+        instruction="""Story: {current_story}""",
         tools=[FunctionTool(exit_loop)],
+        after_model_callback=save_revised_story,  # It overwrites the story with the new version
     )
 
     story_refinement_loop = LoopAgent(
         name="StoryRefinementLoop",
-        sub_agents=[critic_agent, refiner_agent],
+        sub_agents=[critic_refiner_agent],
         max_iterations=2,  # Prevents infinite loops
     )
 
@@ -200,16 +277,39 @@ async def run_section5_loop():
         sub_agents=[initial_writer_agent, story_refinement_loop],
     )
 
+    # No explicit context cache: these requests are a few hundred tokens, below
+    # Gemini's minimum cacheable size, so a cache would never be created. The
+    # static_instruction prefix is left to Gemini's automatic implicit caching.
     runner = InMemoryRunner(agent=root_agent)
-    response = await runner.run_debug(
-        "Write a short story about a lighthouse keeper who discovers a mysterious, glowing map"
+    response = await cached_run_debug(
+        runner,
+        "Write a short story about a lighthouse keeper who discovers a mysterious, glowing map",
     )
     print("--- Final Response (Section 5) ---")
     print(response)
 
 
+SECTIONS = {
+    "section2": run_section2_coordinator,
+    "section3": run_section3_sequential,
+    "section4": run_section4_batched,
+    "section5": run_section5_loop,
+}
+
+
 # --- MAIN function
 async def main():
+    # --- setup comman-line argument parser ---
+    # Parsed before anything else so `--help` returns instantly.
+    parser = argparse.ArgumentParser(description="Run ADK Agent Workflow sections.")
+    parser.add_argument(
+        "sections",
+        nargs="+",
+        choices=SECTIONS.keys(),
+        help="Which notebook section(s) to run. Several sections run concurrently.",
+    )
+    args = parser.parse_args()
+
     # --- load configuration ---
     print("Loading API key from .env file...")
     load_dotenv()
@@ -221,24 +321,8 @@ async def main():
         return
     print("Config loaded.")
 
-    # --- setup comman-line argument parser ---
-    parser = argparse.ArgumentParser(description="Run ADK Agent Workflow sections.")
-    parser.add_argument(
-        "section",
-        choices=["section2", "section3", "section4", "section5"],
-        help="Which notebook section to run.",
-    )
-    args = parser.parse_args()
-
-    # --- run the selected section ---
-    if args.section == "section2":
-        await run_section2_coordinator()
-    elif args.section == "section3":
-        await run_section3_sequential()
-    elif args.section == "section4":
-        await run_section4_parallel()
-    elif args.section == "section5":
-        await run_section5_loop()
+    # --- run the selected sections (each at most once) ---
+    await asyncio.gather(*(SECTIONS[name]() for name in dict.fromkeys(args.sections)))
 
 
 if __name__ == "__main__":
@@ -1,5 +1,8 @@
 import asyncio
+import functools
 import os
+from collections import OrderedDict
+from types import MappingProxyType
 
 from dotenv import load_dotenv
 from google.adk.agents import LlmAgent
@@ -9,6 +12,8 @@ from google.adk.runners import InMemoryRunner
 from google.adk.tools import AgentTool
 from google.genai import types
 
+from llm_cache import cached_run_debug
+
 # --- 1. API Key and Retry Configuration ---
 
 # Check if the API key is set
@@ -29,30 +34,68 @@ retry_config = types.HttpRetryOptions(
 # --- 2. Helper Function (from notebook cell [4]) ---
 
 
+# Extracted output per event id, so repeated dumps over a growing event list
+# only parse the new events. Bounded so long sessions do not grow it forever.
+_CALCULATION_OUTPUT_CACHE_SIZE = 256
+_calculation_outputs = OrderedDict()
+
+
+def _extract_calculation_output(event):
+    """Returns the line to print for a code-executor event, or None."""
+    parts = getattr(event.content, "parts", None)
+    if not parts or not parts[0]:
+        return None
+    payload = getattr(parts[0].function_response, "response", None)
+    if not payload or payload.get("result") in (None, "```"):
+        return None
+    result = payload["result"]
+    if "tool_code" in result:
+        return f"Generated Python Code >> \n {result.replace('tool_code', '', 1)}"
+    return f"Generated Python Response >>  {result}"
+
+
 def show_python_code_and_result(response):
     """Prints the generated Python code and results from the code executor."""
     print("\n--- 🕵️ Agent's Calculation ---")
-    for i in range(len(response)):
-        if (
-            (response[i].content.parts)
-            and (response[i].content.parts[0])
-            and (response[i].content.parts[0].function_response)
-            and (response[i].content.parts[0].function_response.response)
-        ):
-            response_code = response[i].content.parts[0].function_response.response
-            if "result" in response_code and response_code["result"] != "```":
-                if "tool_code" in response_code["result"]:
-                    print(
-                        "Generated Python Code >> \n",
-                        response_code["result"].replace("tool_code", ""),
-                    )
-                else:
-                    print("Generated Python Response >> ", response_code["result"])
+    for event in response:
+        if event.id in _calculation_outputs:
+            _calculation_outputs.move_to_end(event.id)
+            output = _calculation_outputs[event.id]
+        else:
+            output = _extract_calculation_output(event)
+            _calculation_outputs[event.id] = output
+            if len(_calculation_outputs) > _CALCULATION_OUTPUT_CACHE_SIZE:
+                _calculation_outputs.popitem(last=False)
+        if output:
+            print(output)
     print("---------------------------------")
 
 
 # --- 3. Custom Tool Definitions (from notebook cells [6] & [7]) ---
 
+# Lookup tables are built once at import, with keys already casefolded.
+_FEE_DB = MappingProxyType(
+    {
+        k.casefold(): v
+        for k, v in {
+            "platinum credit card": 0.02,  # 2%
+            "gold debit card": 0.035,  # 3.5%
+            "bank transfer": 0.01,  # 1%
+        }.items()
+    }
+)
+
+_RATE_DB = MappingProxyType(
+    {
+        (base.casefold(), target.casefold()): rate
+        for (base, target), rate in {
+            ("usd", "eur"): 0.93,  # Euro
+            ("usd", "jpy"): 157.50,  # Japanese Yen
+            ("usd", "inr"): 83.58,  # Indian Rupee
+        }.items()
+    }
+)
+
 
 def get_fee_for_payment_method(method: str) -> dict:
     """Looks up the transaction fee percentage for a given payment method.
@@ -69,12 +112,7 @@ def get_fee_for_payment_method(method: str) -> dict:
         Success: {"status": "success", "fee_percentage": 0.02}
         Error: {"status": "error", "error_message": "Payment method not found"}
     """
-    fee_database = {
-        "platinum credit card": 0.02,  # 2%
-        "gold debit card": 0.035,  # 3.5%
-        "bank transfer": 0.01,  # 1%
-    }
-    fee = fee_database.get(method.lower())
+    fee = _FEE_DB.get(method.casefold())
     if fee is not None:
         return {"status": "success", "fee_percentage": fee}
     else:
@@ -98,16 +136,7 @@ def get_exchange_rate(base_currency: str, target_currency: str) -> dict:
         Success: {"status": "success", "rate": 0.93}
         Error: {"status": "error", "error_message": "Unsupported currency pair"}
     """
-    rate_database = {
-        "usd": {
-            "eur": 0.93,  # Euro
-            "jpy": 157.50,  # Japanese Yen
-            "inr": 83.58,  # Indian Rupee
-        }
-    }
-    base = base_currency.lower()
-    target = target_currency.lower()
-    rate = rate_database.get(base, {}).get(target)
+    rate = _RATE_DB.get((base_currency.casefold(), target_currency.casefold()))
     if rate is not None:
         return {"status": "success", "rate": rate}
     else:
@@ -119,53 +148,66 @@ def get_exchange_rate(base_currency: str, target_currency: str) -> dict:
 
 # --- 4. Agent Definitions (from notebook cells [10] & [11]) ---
 
+# Agents are built on first use rather than at import, so importing this
+# module (e.g. for the helpers above) does not construct agents or models.
+
+
 # The specialist agent for reliable math
-calculation_agent = LlmAgent(
-    name="CalculationAgent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
-    instruction="""You are a specialized calculator that ONLY responds with Python code.
-    You are forbidden from providing any text, explanations, or conversational responses.
-    Your task is to take a request for a calculation and translate it into a single
-    block of Python code that calculates the answer.
-    **RULES:**
-    1.  Your output MUST be ONLY a Python code block.
-    2.  Do NOT write any text before or after the code block.
-    3.  The Python code MUST calculate the result.
-    4.  The Python code MUST print the final result to stdout.
-    5.  You are PROHIBITED from performing the calculation yourself.
-        Your only job is to generate the code that will perform the calculation.
-    Failure to follow these rules will result in an error.
-    """,
-    code_executor=BuiltInCodeExecutor(),
-)
+@functools.lru_cache(maxsize=1)
+def get_calculation_agent():
+    return LlmAgent(
+        name="CalculationAgent",
+        model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+        instruction="""You are a specialized calculator that ONLY responds with Python code.
+        You are forbidden from providing any text, explanations, or conversational responses.
+        Your task is to take a request for a calculation and translate it into a single
+        block of Python code that calculates the answer.
+        **RULES:**
+        1.  Your output MUST be ONLY a Python code block.
+        2.  Do NOT write any text before or after the code block.
+        3.  The Python code MUST calculate the result.
+        4.  The Python code MUST print the final result to stdout.
+        5.  You are PROHIBITED from performing the calculation yourself.
+            Your only job is to generate the code that will perform the calculation.
+        Failure to follow these rules will result in an error.
+        """,
+        code_executor=BuiltInCodeExecutor(),
+    )
+
 
 # The main "manager" agent
-enhanced_currency_agent = LlmAgent(
-    name="enhanced_currency_agent",
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
-    instruction="""You are a smart currency conversion assistant.
-    You must strictly follow these steps and use the available tools.
-    For any currency conversion request:
-    1. Get Transaction Fee: Use the get_fee_for_payment_method() tool.
-    2. Get Exchange Rate: Use the get_exchange_rate() tool.
-    3. Error Check: After each tool call, you must check the "status" field.
-       If "error", stop and explain the issue.
-    4. Calculate Final Amount (CRITICAL): You are strictly prohibited from
-       performing any arithmetic yourself. You must use the
-       calculation_agent tool to generate Python code that calculates the
-       final converted amount.
-    5. Provide Detailed Breakdown: State the final amount and explain how
-       it was calculated, including the fee, the amount after fee,
-       and the exchange rate.
-    """,
-    tools=[
-        get_fee_for_payment_method,
-        get_exchange_rate,
-        AgentTool(agent=calculation_agent),  # Using the other agent as a tool!
-    ],
-)
+@functools.lru_cache(maxsize=1)
+def get_enhanced_currency_agent():
+    agent = LlmAgent(
+        name="enhanced_currency_agent",
+        model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+        instruction="""You are a smart currency conversion assistant.
+        You must strictly follow these steps and use the available tools.
+        For any currency conversion request:
+        1. Get Fee and Exchange Rate: Call BOTH get_fee_for_payment_method()
+           AND get_exchange_rate() in the same turn. They do not depend on
+           each other, so do not wait for one before calling the other.
+        2. Wait for both results.
+        3. Error Check: Only after both tools return, check the "status" field
+           of each result. If either is "error", stop and explain the issue.
+        4. Calculate Final Amount (CRITICAL): You are strictly prohibited from
+           performing any arithmetic yourself. You must use the
+           calculation_agent tool to generate Python code that calculates the
+           final converted amount.
+        5. Provide Detailed Breakdown: State the final amount and explain how
+           it was calculated, including the fee, the amount after fee,
+           and the exchange rate.
+        """,
+        tools=[
+            get_fee_for_payment_method,
+            get_exchange_rate,
+            # Using the other agent as a tool!
+            AgentTool(agent=get_calculation_agent()),
+        ],
+    )
+    print("✅ Agents and tools defined.")
+    return agent
 
-print("✅ Agents and tools defined.")
 
 # --- 5. Main function to run the agent ---
 
@@ -184,14 +226,14 @@ async def main():
     print("Config loaded.")
 
     print("🚀 Initializing agent runner...")
-    enhanced_runner = InMemoryRunner(agent=enhanced_currency_agent)
+    enhanced_runner = InMemoryRunner(agent=get_enhanced_currency_agent())
 
     # The prompt from the notebook (cell [13])
     user_prompt = "Convert 1,250 USD to INR using a Bank Transfer. Show me the precise calculation."
     print(f"\n💬 User > {user_prompt}\n")
 
     # Run the agent and get the full debug response
-    response = await enhanced_runner.run_debug(user_prompt)
+    response = await cached_run_debug(enhanced_runner, user_prompt)
 
     # The final answer is the last message in the response
     final_answer = response[-1].content.parts[0].text
@@ -1,6 +1,7 @@
 import asyncio
 import os
 import uuid
+from contextlib import aclosing
 
 from dotenv import load_dotenv
 from google.adk.agents import LlmAgent
@@ -46,7 +47,7 @@ mcp_image_server = McpToolset(
         timeout=30,
     )
 )
-print("✅ MCP Tool defined (will launch npx server on first use).")
+print("✅ MCP Tool defined (npx server is pre-warmed when main() starts).")
 
 
 # TOOL 2: The LRO Approval Tool (from Section 3, adapted for the exercise)
@@ -132,36 +133,39 @@ print("✅ Resumable App and Runner created.")
 # These functions handle detecting the "pause" event and resuming.
 
 
-def check_for_approval(events):
-    """Check if events contain an approval request."""
-    for event in events:
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                if (
-                    part.function_call
-                    and part.function_call.name == "adk_request_confirmation"
-                ):
-                    return {
-                        "approval_id": part.function_call.id,
-                        "invocation_id": event.invocation_id,
-                    }
+APPROVAL_FUNCTION_NAME = "adk_request_confirmation"
+# ADK system calls that pause the run for a human decision. Add new ones here.
+APPROVAL_FUNCTION_NAMES = frozenset({APPROVAL_FUNCTION_NAME})
+
+
+def check_event_for_approval(event):
+    """Check if an event is an approval request."""
+    parts = event.content.parts if event.content else None
+    for part in parts or ():
+        function_call = part.function_call
+        if function_call and function_call.name in APPROVAL_FUNCTION_NAMES:
+            return {
+                "approval_id": function_call.id,
+                "invocation_id": event.invocation_id,
+            }
     return None
 
 
-def print_agent_response(events):
-    """Print agent's text responses from events."""
-    for event in events:
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                if part.text:
-                    print(f"🤖 Agent > {part.text}")
+def print_event_text(label, event):
+    """Print agent's text responses from an event, tagged with the demo label."""
+    if event.content and event.content.parts:
+        for part in event.content.parts:
+            if part.text:
+                # Label every line so multi-line replies stay attributable.
+                for line in part.text.splitlines():
+                    print(f"[{label}] 🤖 Agent > {line}")
 
 
 def create_approval_response(approval_info, approved):
     """Create approval response message."""
     confirmation_response = types.FunctionResponse(
         id=approval_info["approval_id"],
-        name="adk_request_confirmation",
+        name=APPROVAL_FUNCTION_NAME,
         response={"confirmed": approved},
     )
     return types.Content(
@@ -169,50 +173,77 @@ def create_approval_response(approval_info, approved):
     )
 
 
-async def run_image_workflow(query: str, auto_approve: bool = True):
-    """Runs the full image workflow, simulating a human decision."""
-    print(f"\n{'=' * 60}")
-    print(f"👤 User > {query}\n")
-    session_id = f"session_{uuid.uuid4().hex[:8]}"
-    await session_service.create_session(
-        app_name="image_approver_app", user_id="local_user", session_id=session_id
-    )
+IMAGE_TOOL_NAME = "getTinyImage"
+
+
+class ApprovalRejected(Exception):
+    """Raised when the agent tries to generate images for a rejected order."""
+
+
+async def resume_workflow(label, session_id, approval_info, approved):
+    """Resumes the paused run with the human decision and prints the reply."""
+    # aclosing() shuts the ADK invocation down as soon as we stop iterating,
+    # instead of leaving the generator open until garbage collection.
+    async with aclosing(
+        exercise_runner.run_async(
+            user_id="local_user",
+            session_id=session_id,
+            new_message=create_approval_response(approval_info, approved),
+            invocation_id=approval_info["invocation_id"],  # CRITICAL: Resumes
+        )
+    ) as events:
+        async for event in events:
+            # The function call event arrives before the tool runs, so stopping
+            # here means the MCP image call is never made. The session is left
+            # holding that getTinyImage function_call with no response, so it
+            # should not be resumed again.
+            if not approved and any(
+                call.name == IMAGE_TOOL_NAME for call in event.get_function_calls()
+            ):
+                raise ApprovalRejected(f"{IMAGE_TOOL_NAME} called after rejection")
+            print_event_text(label, event)
+
+
+async def run_image_workflow(
+    label: str, session_id: str, query: str, auto_approve: bool = True
+):
+    """Runs the full image workflow, simulating a human decision.
+
+    The demos run concurrently, so every line is prefixed with `label`.
+    """
+    print(f"[{label}] {'=' * 60}")
+    print(f"[{label}] 👤 User > {query}")
 
     query_content = types.Content(role="user", parts=[types.Part(text=query)])
-    events = []
+    approval_info = None
 
-    # STEP 1: Send initial request
+    # STEP 1: Send initial request, handling events as they arrive
     async for event in exercise_runner.run_async(
         user_id="local_user", session_id=session_id, new_message=query_content
     ):
-        events.append(event)
-
-    # STEP 2: Check if the agent paused for approval
-    approval_info = check_for_approval(events)
+        # STEP 2: Check if the agent paused for approval
+        if approval_info is None:
+            approval_info = check_event_for_approval(event)
+        print_event_text(label, event)
 
-    # STEP 3: Handle the result
+    # STEP 3: Handle the result. If no approval was needed (PATH B), the final
+    # response has already been printed while streaming.
     if approval_info:
         # PATH A: Agent paused, needs human input
-        print(f"⏸️  Workflow Paused: Agent is waiting for human approval.")
+        print(f"[{label}] ⏸️  Workflow Paused: Agent is waiting for human approval.")
         decision = "APPROVE ✅" if auto_approve else "REJECT ❌"
-        print(f"🤔 Human Decision (Simulated): {decision}\n")
+        print(f"[{label}] 🤔 Human Decision (Simulated): {decision}")
 
-        # Resume the agent, sending the decision
-        async for event in exercise_runner.run_async(
-            user_id="local_user",
-            session_id=session_id,
-            new_message=create_approval_response(approval_info, auto_approve),
-            invocation_id=approval_info["invocation_id"],  # CRITICAL: Resumes
-        ):
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.text:
-                        print(f"🤖 Agent > {part.text}")
-    else:
-        # PATH B: No approval needed, print final response
-        print_agent_response(events)
+        # Resume the agent, sending the decision. The resumed run is stopped as
+        # soon as it acts on a rejected order.
+        try:
+            await resume_workflow(label, session_id, approval_info, auto_approve)
+        except ApprovalRejected:
+            print(
+                f"[{label}] 🛑 Order rejected: cancelled the agent's image generation."
+            )
 
-    print(f"{'=' * 60}")
+    print(f"[{label}] {'=' * 60}")
 
 
 # --- 6. Main function to run the demos ---
@@ -221,6 +252,10 @@ async def run_image_workflow(query: str, auto_approve: bool = True):
 async def main():
     print("🚀 Starting Exercise Demos...")
 
+    # Launch the npx MCP server in the background so its cold start overlaps
+    # with configuration instead of delaying the first tool-enabled LLM call.
+    mcp_warmup = asyncio.create_task(mcp_image_server.get_tools())
+
     print("Loading API key from .env file...")
     load_dotenv()
 
@@ -228,18 +263,45 @@ async def main():
     if not GOOGLE_API_KEY:
         print("Authentication Error: 'GOOGLE_API_KEY' not found")
         print("please make sure you have a .env file with your key")
+        mcp_warmup.cancel()
         return
 
-    # Demo 1: Small order (1 image) -> Should auto-approve and call getTinyImage
-    await run_image_workflow("Please get me 1 tiny image of a cat.")
-
-    # Demo 2: Large order (5 images) -> Should pause, then APPROVE
-    await run_image_workflow(
-        "I need a bulk order of 5 tiny images for my project.", auto_approve=True
+    # Create all demo sessions up front, while the MCP server finishes starting,
+    # so no demo's first model call waits behind another demo's setup.
+    session_ids = [f"session_{uuid.uuid4().hex[:8]}" for _ in range(3)]
+    await asyncio.gather(
+        mcp_warmup,
+        *(
+            session_service.create_session(
+                app_name="image_approver_app", user_id="local_user", session_id=s
+            )
+            for s in session_ids
+        ),
+    )
+    print("✅ MCP server and sessions ready.")
+
+    # Each demo runs in its own session, so they have no shared state and can
+    # run concurrently. Their lines interleave, so each one carries its demo label.
+    await asyncio.gather(
+        # Demo 1: Small order (1 image) -> Should auto-approve and call getTinyImage
+        run_image_workflow(
+            "Demo 1", session_ids[0], "Please get me 1 tiny image of a cat."
+        ),
+        # Demo 2: Large order (5 images) -> Should pause, then APPROVE
+        run_image_workflow(
+            "Demo 2",
+            session_ids[1],
+            "I need a bulk order of 5 tiny images for my project.",
+            auto_approve=True,
+        ),
+        # Demo 3: Large order (10 images) -> Should pause, then REJECT
+        run_image_workflow(
+            "Demo 3",
+            session_ids[2],
+            "Generate 10 tiny images for me.",
+            auto_approve=False,
+        ),
     )
-
-    # Demo 3: Large order (10 images) -> Should pause, then REJECT
-    await run_image_workflow("Generate 10 tiny images for me.", auto_approve=False)
 
     print("\n✅ All demos complete.")
 
@@ -0,0 +1,71 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import llm_cache
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# A function with a nested code object: repr() of its co_consts would contain
+# a memory address that changes between interpreter runs.
+DESCRIBE_SNIPPET = """
+import llm_cache
+
+def callback(parts):
+    return "".join(p for p in parts)
+
+print(llm_cache._describe_callable(callback))
+"""
+
+
+def _describe_in_new_interpreter():
+    result = subprocess.run(
+        [sys.executable, "-c", DESCRIBE_SNIPPET],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+def test_callable_digest_is_stable_across_interpreter_runs():
+    assert _describe_in_new_interpreter() == _describe_in_new_interpreter()
+
+
+def test_callable_digest_changes_when_nested_code_changes():
+    def first(parts):
+        return "".join(p for p in parts)
+
+    def second(parts):
+        return "".join(p.upper() for p in parts)
+
+    first_digest = llm_cache._describe_callable(first).split(":")[-1]
+    second_digest = llm_cache._describe_callable(second).split(":")[-1]
+    assert first_digest != second_digest
+
+
+def test_read_entry_treats_corrupt_files_as_missing(tmp_path):
+    truncated = tmp_path / "truncated.json"
+    truncated.write_text('{"created": 1, "events": ["{', encoding="utf-8")
+    no_events = tmp_path / "no_events.json"
+    no_events.write_text('{"created": 1}', encoding="utf-8")
+
+    assert llm_cache._read_entry(truncated) is None
+    assert llm_cache._read_entry(no_events) is None
+    assert llm_cache._read_entry(tmp_path / "missing.json") is None
+
+
+def test_write_entry_round_trips_without_leaving_temp_files(tmp_path):
+    path = tmp_path / "cache" / "key.json"
+    entry = {"created": 1.0, "events": ["{}"]}
+
+    llm_cache._write_entry(path, entry)
+
+    assert llm_cache._read_entry(path) == entry
+    assert [p.name for p in path.parent.iterdir()] == ["key.json"]
+
+
+def test_invalid_ttl_falls_back_to_default(monkeypatch):
+    monkeypatch.setenv("ADK_CACHE_TTL", "one hour")
+    assert llm_cache._ttl_seconds() == llm_cache.DEFAULT_TTL_SECONDS
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+import run_ass1b
+
+
+def _save_sections(text):
+    callback_context = SimpleNamespace(state={})
+    llm_response = SimpleNamespace(
+        content=SimpleNamespace(parts=[SimpleNamespace(text=text)])
+    )
+    run_ass1b.save_research_sections(callback_context, llm_response)
+    return callback_context.state
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "### TECH\nA\n### HEALTH\nB\n### FINANCE\nC",
+        "### TECH:\nA\n### Health Breakthroughs\nB\n### Finance\nC",
+        "## Technology Trends\nA\n## Health\nB\n## Financial Innovations\nC",
+        "### Technology\nA\n### HEALTH\nB\n### FINANCE\nC",
+        "**TECH**\nA\n**HEALTH:** B\n## finance\nC",
+    ],
+)
+def test_save_research_sections_splits_heading_variants(text):
+    assert _save_sections(text) == {
+        "tech_research": "A",
+        "health_research": "B",
+        "finance_research": "C",
+    }
+
+
+def test_save_research_sections_falls_back_to_full_reply():
+    state = _save_sections("An unlabelled briefing.")
+    assert set(state.values()) == {"An unlabelled briefing."}
+    assert len(state) == 3
+
+
+def test_save_research_sections_ignores_body_lines_starting_with_a_topic():
+    state = _save_sections("### TECH\nTech firms grew.\n### HEALTH\nB\n### FINANCE\nC")
+    assert state["tech_research"] == "Tech firms grew."